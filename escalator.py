@@ -6,6 +6,8 @@ Behavior:
 - PreToolUse (`pre-hook`) intercepts AskUserQuestion calls.
 - Posts the question to Slack #claude immediately.
 - Spawns a background watcher that polls Slack every 5s and writes answer to a file.
+  When the launcher runs in Socket Mode it hands thread replies over directly
+  (deliver_thread_reply), so the answer file is written without waiting for a poll.
 - Always DENIES AskUserQuestion with a reason that instructs Claude to:
   1) Print the question/options as plain text
   2) Run a wait-for-reply command that blocks up to 60s watching for Slack answer
@@ -17,21 +19,30 @@ Modes:
   post-hook         - PostToolUse handler (cleanup)
   check-slack-reply - One-shot check for Slack reply
   watch-slack       - Background watcher (polls every 5s, writes answer file)
-  wait-for-reply    - Blocks up to N seconds watching for answer file
+  wait-for-reply    - Blocks up to N seconds watching for answer file (inotify)
 """
 
 from __future__ import annotations
 
 import argparse
+import atexit
+import ctypes
 import json
 import os
+import select
 import signal
+import struct
 import subprocess
 import sys
 import time
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any
+from typing import Any, TextIO
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # ---------- Config ----------
 
@@ -48,6 +59,19 @@ SCRIPT_PATH = str(Path(__file__).resolve())
 WATCH_INTERVAL = 5       # background watcher polls every 5 seconds
 WATCH_TIMEOUT = 900      # watcher gives up after 15 minutes
 WAIT_TIMEOUT_DEFAULT = 900  # wait-for-reply blocks up to 15 minutes
+WAIT_POLL_INTERVAL = 2   # fallback poll interval when inotify is unavailable
+
+# inotify(7) constants (Linux)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+_INOTIFY_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len
+
+# Per-process caches
+_SLACK_CLIENT: Any = None
+_SITE_PACKAGES_ADDED = False
+_ENV_CACHE: tuple[int, dict[str, str]] | None = None
+_META_CACHE: dict[str, dict] = {}
+_LOG_HANDLES: dict[str, TextIO] = {}
 
 
 # ---------- File paths ----------
@@ -61,6 +85,9 @@ def meta_file(sid: str) -> Path:
 def answer_file(sid: str) -> Path:
     return TMP_DIR / f"claude-q-{sid}.slack-answer.txt"
 
+def last_seen_file(sid: str) -> Path:
+    return TMP_DIR / f"claude-q-{sid}.last-seen.txt"
+
 def watcher_pid_file(sid: str) -> Path:
     return TMP_DIR / f"claude-q-{sid}.watch.pid"
 
@@ -73,21 +100,46 @@ def log(msg: str, sid: str | None = None) -> None:
     print(line, file=sys.stderr, flush=True)
     if sid:
         try:
-            with log_file(sid).open("a", encoding="utf-8") as f:
-                f.write(line + "\n")
+            fh = _LOG_HANDLES.get(sid)
+            if fh is None:
+                # Line-buffered: one write() per line, no reopen per call
+                fh = log_file(sid).open("a", encoding="utf-8", buffering=1)
+                _LOG_HANDLES[sid] = fh
+            fh.write(line + "\n")
+        except Exception:
+            pass
+
+
+def _close_log_handles() -> None:
+    for fh in _LOG_HANDLES.values():
+        try:
+            fh.close()
         except Exception:
             pass
+    _LOG_HANDLES.clear()
+
+
+atexit.register(_close_log_handles)
 
 
 def load_env() -> None:
-    if not ENV_FILE.exists():
+    """Apply ENV_FILE to os.environ (without overriding), re-parsing only when its mtime changes."""
+    global _ENV_CACHE
+    try:
+        mtime = ENV_FILE.stat().st_mtime_ns
+    except FileNotFoundError:
         return
-    for raw_line in ENV_FILE.read_text(encoding="utf-8").splitlines():
-        line = raw_line.strip()
-        if not line or line.startswith("#") or "=" not in line:
-            continue
-        key, _, value = line.partition("=")
-        os.environ.setdefault(key.strip(), value.strip())
+    if _ENV_CACHE is None or _ENV_CACHE[0] != mtime:
+        parsed: dict[str, str] = {}
+        for raw_line in ENV_FILE.read_bytes().split(b"\n"):
+            line = raw_line.decode("utf-8").strip()
+            if not line or line.startswith("#") or "=" not in line:
+                continue
+            key, _, value = line.partition("=")
+            parsed[key.strip()] = value.strip()
+        _ENV_CACHE = (mtime, parsed)
+    for key, value in _ENV_CACHE[1].items():
+        os.environ.setdefault(key, value)
 
 
 def get_channel_id() -> str:
@@ -95,26 +147,72 @@ def get_channel_id() -> str:
     return os.environ.get("SLACK_CHANNEL_ID", _SLACK_CHANNEL_ID_DEFAULT)
 
 
+def add_venv_site_packages() -> None:
+    global _SITE_PACKAGES_ADDED
+    if _SITE_PACKAGES_ADDED:
+        return
+    try:
+        entries = list(os.scandir(VENV_LIB_ROOT))
+    except OSError:
+        entries = []
+    for entry in entries:
+        if entry.name.startswith("python") and entry.is_dir(follow_symlinks=False):
+            p_str = f"{entry.path}/site-packages"
+            if p_str not in sys.path:
+                sys.path.insert(0, p_str)
+    _SITE_PACKAGES_ADDED = True
+
+
 def get_slack_client():
+    """Return the per-process Slack WebClient, creating it on first use."""
+    global _SLACK_CLIENT
+    if _SLACK_CLIENT is not None:
+        return _SLACK_CLIENT
     load_env()
-    for p in VENV_LIB_ROOT.glob("python*/site-packages"):
-        p_str = str(p)
-        if p_str not in sys.path:
-            sys.path.insert(0, p_str)
+    add_venv_site_packages()
     from slack_sdk import WebClient
     token = os.environ.get("SLACK_BOT_TOKEN") or os.environ.get("SIMULATOR_SLACK_TOKEN", "")
-    return WebClient(token=token)
+    _SLACK_CLIENT = WebClient(token=token)
+    return _SLACK_CLIENT
+
+
+def json_dumps_bytes(payload: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def json_loads_bytes(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
 
 
 def safe_json_load(path: Path, default: dict) -> dict:
     try:
-        return json.loads(path.read_text(encoding="utf-8"))
+        return json_loads_bytes(path.read_bytes())
     except Exception:
         return default
 
 
 def safe_json_dump(path: Path, payload: dict) -> None:
-    path.write_text(json.dumps(payload, ensure_ascii=True, indent=2), encoding="utf-8")
+    path.write_bytes(json_dumps_bytes(payload))
+
+
+def load_meta(sid: str) -> dict:
+    """Return session meta, reading meta_file (plus the last-seen file) only once per process."""
+    meta = _META_CACHE.get(sid)
+    if meta is not None:
+        return meta
+    meta = safe_json_load(meta_file(sid), {})
+    if not meta:
+        return meta
+    try:
+        meta["last_seen_ts"] = float(last_seen_file(sid).read_text(encoding="utf-8").strip())
+    except (OSError, ValueError):
+        pass
+    _META_CACHE[sid] = meta
+    return meta
 
 
 # ---------- Formatting ----------
@@ -179,6 +277,14 @@ def parse_slack_reply(reply_text: str, options: list[dict]) -> str:
 
 # ---------- Slack operations ----------
 
+def slack_error_code(exc: Exception) -> str:
+    """Slack API error code (e.g. "not_in_channel") carried by a SlackApiError, else ""."""
+    try:
+        return str(getattr(exc, "response").get("error", ""))
+    except Exception:
+        return ""
+
+
 def post_to_slack(sid: str, questions: list[dict]) -> tuple[str | None, float | None]:
     try:
         client = get_slack_client()
@@ -186,17 +292,24 @@ def post_to_slack(sid: str, questions: list[dict]) -> tuple[str | None, float |
         log(f"Slack client init failed: {e}", sid)
         return None, None
 
-    try:
-        client.conversations_join(channel=get_channel_id())
-    except Exception:
-        pass
-
+    channel = get_channel_id()
     text = format_slack_message(questions, sid)
-    try:
-        resp = client.chat_postMessage(
-            channel=get_channel_id(), text=text,
+
+    def post():
+        return client.chat_postMessage(
+            channel=channel, text=text,
             unfurl_links=False, unfurl_media=False,
         )
+
+    try:
+        try:
+            resp = post()
+        except Exception as e:
+            if slack_error_code(e) != "not_in_channel":
+                raise
+            # Join only when Slack says we have to, then retry once
+            client.conversations_join(channel=channel)
+            resp = post()
         thread_ts = resp.get("ts")
         baseline_ts = float(thread_ts) if thread_ts else None
         log(f"Posted to Slack (thread_ts={thread_ts})", sid)
@@ -206,70 +319,117 @@ def post_to_slack(sid: str, questions: list[dict]) -> tuple[str | None, float |
         return None, None
 
 
+def first_question_options(meta: dict) -> list[dict]:
+    questions = meta.get("questions", [])
+    if questions and isinstance(questions[0], dict):
+        raw = questions[0].get("options", [])
+        if isinstance(raw, list):
+            return [o for o in raw if isinstance(o, dict)]
+    return []
+
+
+def record_slack_answer(sid: str, client, meta: dict, message: dict) -> str:
+    """Normalize a Slack reply, persist it to the answer file and confirm in the thread."""
+    raw_text = str(message.get("text", "")).strip()
+    normalized = parse_slack_reply(raw_text, first_question_options(meta))
+    msg_ts = float(message.get("ts", "0") or 0.0)
+
+    # Write answer file. Exclusive create: the watcher and the launcher may both
+    # see the reply, and only the first one records and confirms it.
+    try:
+        with answer_file(sid).open("x", encoding="utf-8") as f:
+            f.write(normalized + "\n")
+    except FileExistsError:
+        return ""
+    log(f"Found Slack answer: {normalized!r}", sid)
+
+    # Update last_seen (small dedicated file instead of re-serializing meta)
+    meta["last_seen_ts"] = msg_ts
+    last_seen_file(sid).write_text(str(msg_ts), encoding="utf-8")
+
+    # Confirm on Slack
+    try:
+        client.chat_postMessage(
+            channel=meta.get("channel_id") or get_channel_id(),
+            text=f":white_check_mark: Got it! Answering with: *{normalized}*",
+            thread_ts=meta.get("thread_ts"),
+            unfurl_links=False, unfurl_media=False,
+        )
+    except Exception:
+        pass
+
+    return normalized
+
+
+def deliver_thread_reply(event: dict) -> str:
+    """Record a pushed Slack thread reply for the pending question that owns the thread.
+
+    Called by the launcher, which holds the app's only Socket Mode connection.
+    Returns the recorded answer, or empty string if no question was waiting on it.
+    """
+    thread_ts = event.get("thread_ts")
+    if not thread_ts or event.get("bot_id") or event.get("subtype"):
+        return ""
+    for path in TMP_DIR.glob("claude-q-*.meta.json"):
+        # Read from disk, not _META_CACHE: a session id is reused across questions
+        meta = safe_json_load(path, {})
+        if meta.get("thread_ts") != thread_ts or meta.get("channel_id") != event.get("channel"):
+            continue
+        sid = path.name[len("claude-q-"):-len(".meta.json")]
+        if answer_file(sid).exists():
+            return ""
+        last_seen_ts = float(meta.get("last_seen_ts") or meta.get("baseline_ts") or 0.0)
+        try:
+            last_seen_ts = float(last_seen_file(sid).read_text(encoding="utf-8").strip())
+        except (OSError, ValueError):
+            pass
+        if float(event.get("ts", "0") or 0.0) <= last_seen_ts:
+            return ""
+        return record_slack_answer(sid, get_slack_client(), meta, event)
+    return ""
+
+
 def check_slack_reply_once(sid: str) -> str:
     """One-shot: check Slack thread for a new user reply. Returns answer or empty string."""
-    meta = safe_json_load(meta_file(sid), {})
+    meta = load_meta(sid)
     thread_ts = meta.get("thread_ts")
     if not thread_ts:
         return ""
 
     baseline_ts = float(meta.get("baseline_ts") or 0.0)
     last_seen_ts = float(meta.get("last_seen_ts") or baseline_ts)
-    questions = meta.get("questions", [])
-    first_options: list[dict] = []
-    if questions and isinstance(questions[0], dict):
-        raw = questions[0].get("options", [])
-        if isinstance(raw, list):
-            first_options = [o for o in raw if isinstance(o, dict)]
 
+    # Only ask for replies newer than what we've already seen
     try:
         client = get_slack_client()
         resp = client.conversations_replies(
-            channel=get_channel_id(), ts=thread_ts, limit=100,
+            channel=get_channel_id(), ts=thread_ts,
+            oldest=f"{last_seen_ts:.6f}", inclusive=False, limit=10,
         )
     except Exception as e:
         log(f"check-slack-reply error: {e}", sid)
         return ""
 
-    messages = resp.get("messages", []) or []
-    latest_user_msg = None
+    # The parent message may be echoed back regardless of `oldest`
+    messages = [m for m in resp.get("messages", []) or [] if m.get("ts") != thread_ts]
+    if not messages:
+        return ""
 
-    for m in messages[1:]:
+    # Messages are oldest-first: walk back from the newest and stop at the first hit
+    latest_user_msg = None
+    for m in reversed(messages):
         if m.get("bot_id") or m.get("subtype"):
             continue
         msg_ts = float(m.get("ts", "0") or 0.0)
         if msg_ts <= baseline_ts or msg_ts <= last_seen_ts:
-            continue
+            break  # everything before this is older too
         latest_user_msg = m
+        break
 
     if not latest_user_msg:
         return ""
 
-    raw_text = str(latest_user_msg.get("text", "")).strip()
-    normalized = parse_slack_reply(raw_text, first_options)
-    msg_ts = float(latest_user_msg.get("ts", "0") or 0.0)
-
-    # Update last_seen
-    meta["last_seen_ts"] = msg_ts
-    safe_json_dump(meta_file(sid), meta)
-
-    # Write answer file
-    answer_file(sid).write_text(normalized + "\n", encoding="utf-8")
-    log(f"Found Slack answer: {normalized!r}", sid)
-
-    # Confirm on Slack
-    try:
-        client = get_slack_client()
-        client.chat_postMessage(
-            channel=get_channel_id(),
-            text=f":white_check_mark: Got it! Answering with: *{normalized}*",
-            thread_ts=thread_ts,
-            unfurl_links=False, unfurl_media=False,
-        )
-    except Exception:
-        pass
-
-    return normalized
+    return record_slack_answer(sid, client, meta, latest_user_msg)
 
 
 # ---------- Build deny reason (merged Claude + Codex approach) ----------
@@ -362,6 +522,7 @@ def pre_hook() -> None:
 
     # Clean previous artifacts
     answer_file(sid).unlink(missing_ok=True)
+    last_seen_file(sid).unlink(missing_ok=True)
     watcher_pid_file(sid).unlink(missing_ok=True)
 
     # Post to Slack
@@ -416,7 +577,7 @@ def post_hook() -> None:
         wpf.unlink(missing_ok=True)
 
     # Cleanup
-    for p in (meta_file(sid), answer_file(sid), log_file(sid)):
+    for p in (meta_file(sid), answer_file(sid), last_seen_file(sid), log_file(sid)):
         p.unlink(missing_ok=True)
 
 
@@ -445,19 +606,75 @@ def watch_slack(sid: str) -> None:
 
 # ---------- Wait-for-reply (blocking, for Claude to call) ----------
 
+def _inotify_watch_dir(path: Path, mask: int) -> int | None:
+    """Return an inotify fd watching `path` for `mask`, or None if inotify is unavailable."""
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, str(path).encode(), mask) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _wait_for_inotify_name(fd: int, name: str, timeout: float) -> bool:
+    """Block until an inotify event for `name` arrives on `fd`. Returns False on timeout."""
+    deadline = time.time() + timeout
+    target = name.encode()
+    while True:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return False
+        ready, _, _ = select.select([fd], [], [], remaining)
+        if not ready:
+            return False
+        buf = os.read(fd, 4096)
+        offset = 0
+        while offset + _INOTIFY_EVENT.size <= len(buf):
+            _wd, _mask, _cookie, name_len = _INOTIFY_EVENT.unpack_from(buf, offset)
+            offset += _INOTIFY_EVENT.size
+            event_name = buf[offset:offset + name_len].rstrip(b"\0")
+            offset += name_len
+            if event_name == target:
+                return True
+
+
+def _read_answer(af: Path) -> str:
+    try:
+        return af.read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return ""
+
+
 def wait_for_reply(sid: str, timeout: int) -> None:
-    """Block up to `timeout` seconds, checking answer file every 2 seconds.
+    """Block up to `timeout` seconds waiting for the answer file to be written.
+    Uses inotify on TMP_DIR where available, otherwise polls every 2 seconds.
     Prints SLACK_ANSWER: <answer> if found, or NO_ANSWER if timeout."""
     deadline = time.time() + timeout
     af = answer_file(sid)
 
-    while time.time() < deadline:
-        if af.exists():
-            answer = af.read_text(encoding="utf-8").strip()
+    # Arm the watch before the first existence check so a write in between isn't missed
+    fd = _inotify_watch_dir(af.parent, IN_CLOSE_WRITE | IN_MOVED_TO)
+    try:
+        while True:
+            answer = _read_answer(af)
             if answer:
                 print(f"SLACK_ANSWER: {answer}")
                 return
-        time.sleep(2)
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            if fd is None:
+                time.sleep(min(WAIT_POLL_INTERVAL, remaining))
+            else:
+                _wait_for_inotify_name(fd, af.name, remaining)
+    finally:
+        if fd is not None:
+            os.close(fd)
 
     print("NO_ANSWER")
 
@@ -2,7 +2,8 @@
 """
 Slack-to-Claude Launcher
 
-Polls Slack #claude for messages that @mention the bot with /claude command.
+Listens on Slack #claude for messages that @mention the bot with /claude command
+(via Socket Mode when SLACK_APP_TOKEN is set, otherwise by polling).
 When found, spins up a new tmux session running Claude Code with the user's task.
 
 Usage in Slack:
@@ -19,14 +20,25 @@ Runs as a systemd user service (slack-launcher.service).
 
 import sys
 import os
+import collections
 import json
 import time
 import re
+import select
 import subprocess
-import hashlib
+import threading
+import secrets
+import string
 from pathlib import Path
 from datetime import datetime
 
+import escalator
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # ---------- Config ----------
 
 # Path to .env file containing SLACK_BOT_TOKEN (and optionally SLACK_APP_TOKEN)
@@ -41,9 +53,23 @@ SLACK_CHANNEL_ID = "YOUR_CHANNEL_ID"  # UPDATE THIS — your Slack channel ID (s
 BOT_USER_ID = "YOUR_BOT_USER_ID"   # UPDATE THIS — your bot's user ID (starts with U)
 
 POLL_INTERVAL = 5                   # seconds between checks
+PROCESSED_MAX = 100                 # processed message timestamps remembered across polls
+SESSION_CHECK_INTERVAL = 10         # seconds between session checks in Socket Mode
 STATE_FILE = Path("/tmp/claude-launcher-state.json")
 LOG_DIR = Path.home() / "claude-sessions"
 CLAUDE_BIN = Path.home() / ".local" / "bin" / "claude"
+SUMMARY_TAIL_BYTES = 2048           # bytes read from the end of a log for the summary
+
+_MENTION_RE = re.compile(r'<@[A-Z0-9]+>')
+
+# ASCII bytes that aren't [a-zA-Z0-9 ], stripped from session-name slugs
+_SLUG_DELETE = bytes(
+    b for b in range(128)
+    if chr(b) not in string.ascii_letters + string.digits + " "
+)
+
+# pidfds for launched wrapper processes (in-memory only; state keeps the PID)
+_SESSION_PIDFDS = {}
 
 # ---------- Helpers ----------
 
@@ -63,10 +89,15 @@ def get_slack_client():
     # Add venv site-packages to path (look for venv next to this script, or fallback)
     script_dir = Path(__file__).resolve().parent
     for venv_root in [script_dir / "venv"]:
-        venv_pkgs = venv_root / "lib"
-        for p in venv_pkgs.glob("python*/site-packages"):
-            if str(p) not in sys.path:
-                sys.path.insert(0, str(p))
+        try:
+            entries = list(os.scandir(venv_root / "lib"))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name.startswith("python") and entry.is_dir(follow_symlinks=False):
+                p = f"{entry.path}/site-packages"
+                if p not in sys.path:
+                    sys.path.insert(0, p)
     from slack_sdk import WebClient
     token = os.environ.get("SLACK_BOT_TOKEN") or os.environ.get("SIMULATOR_SLACK_TOKEN", "")
     return WebClient(token=token)
@@ -78,11 +109,25 @@ def log(msg):
     print(f"[{ts}] {msg}", flush=True)
 
 
+def json_dumps_bytes(obj):
+    """Serialize to compact UTF-8 JSON bytes (orjson if installed, stdlib json otherwise)."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def json_loads_bytes(data):
+    """Parse JSON bytes (orjson if installed, stdlib json otherwise)."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
 def load_state():
     """Load processed message timestamps."""
     if STATE_FILE.exists():
         try:
-            return json.loads(STATE_FILE.read_text())
+            return json_loads_bytes(STATE_FILE.read_bytes())
         except Exception:
             pass
     return {"processed": [], "sessions": {}}
@@ -90,16 +135,16 @@ def load_state():
 
 def save_state(state):
     """Save state to disk."""
-    STATE_FILE.write_text(json.dumps(state, indent=2))
+    STATE_FILE.write_bytes(json_dumps_bytes(state))
 
 
 def make_session_name(task_text):
     """Generate a short, unique tmux session name from task text."""
-    # Take first few words + short hash
-    words = re.sub(r'[^a-zA-Z0-9 ]', '', task_text).split()[:3]
+    # Take first few words + short random suffix
+    cleaned = task_text.encode("ascii", "ignore").translate(None, _SLUG_DELETE).decode("ascii")
+    words = cleaned.split()[:3]
     slug = "-".join(w.lower() for w in words) if words else "task"
-    short_hash = hashlib.md5(f"{task_text}{time.time()}".encode()).hexdigest()[:4]
-    return f"claude-{slug}-{short_hash}"
+    return f"claude-{slug}-{secrets.token_hex(2)}"
 
 
 def parse_command(text):
@@ -108,8 +153,12 @@ def parse_command(text):
     Expected format: <@BOT_USER_ID> /claude <task description>
     Returns task text or None.
     """
+    # Fast path: most channel traffic isn't a command at all
+    if '/claude' not in text:
+        return None
+
     # Remove the bot mention
-    text = re.sub(r'<@[A-Z0-9]+>', '', text).strip()
+    text = _MENTION_RE.sub('', text).strip()
 
     # Check for /claude prefix
     if text.startswith('/claude'):
@@ -120,7 +169,10 @@ def parse_command(text):
 
 
 def launch_claude_session(task_text, session_name, log_file):
-    """Launch Claude Code in a new tmux session with the given task."""
+    """Launch Claude Code in a new tmux session with the given task.
+
+    Returns the wrapper PID (0 if tmux didn't report it), or None on failure.
+    """
     # Create the wrapper script that runs claude with the task
     wrapper = Path(f"/tmp/claude-launch-{session_name}.sh")
     wrapper.write_text(f"""#!/bin/bash
@@ -145,25 +197,38 @@ sleep 30
 """)
     wrapper.chmod(0o755)
 
-    # Create tmux session
+    # Create tmux session, printing the wrapper's PID so we can watch it exit
     result = subprocess.run(
-        ["tmux", "new-session", "-d", "-s", session_name, str(wrapper)],
+        ["tmux", "new-session", "-d", "-P", "-F", "#{pane_pid}", "-s", session_name, str(wrapper)],
         capture_output=True, text=True,
     )
 
     if result.returncode != 0:
         log(f"Failed to create tmux session: {result.stderr}")
-        return False
+        return None
 
-    log(f"Launched tmux session: {session_name}")
-    return True
+    try:
+        pid = int(result.stdout.strip())
+    except ValueError:
+        pid = 0
+
+    log(f"Launched tmux session: {session_name} (pid={pid or 'unknown'})")
+    return pid
 
 
 def post_completion_summary(client, channel, thread_ts, session_name, log_file):
     """Post a summary of Claude's output to the Slack thread."""
     try:
-        if Path(log_file).exists():
-            output = Path(log_file).read_text()
+        try:
+            # Read only the tail of the log instead of the whole file
+            with open(log_file, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                f.seek(max(0, f.tell() - SUMMARY_TAIL_BYTES))
+                output = f.read().decode("utf-8", "replace")
+        except FileNotFoundError:
+            output = None
+
+        if output is not None:
             # Get last ~500 chars as summary
             if len(output) > 500:
                 summary = "..." + output[-500:]
@@ -189,18 +254,87 @@ def post_completion_summary(client, channel, thread_ts, session_name, log_file):
         log(f"Failed to post completion summary: {e}")
 
 
+def list_tmux_sessions():
+    """Return {session name: pane PID} for live tmux sessions (empty if no server is running)."""
+    result = subprocess.run(
+        ["tmux", "list-sessions", "-F", "#{session_name} #{pane_pid}"],
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        # "no server running" (or no sessions) means every session is gone
+        return {}
+    live = {}
+    for line in result.stdout.splitlines():
+        name, _, pid = line.rpartition(" ")
+        try:
+            live[name] = int(pid)
+        except ValueError:
+            live[line] = 0
+    return live
+
+
+def open_session_pidfd(session_name, pid):
+    """Open and remember a pidfd for a session's wrapper process.
+
+    Returns None when pidfds are unsupported, the PID is unknown, or the
+    process is already gone (tmux will report that session as ended).
+    """
+    if not pid or not hasattr(os, "pidfd_open"):
+        return None
+    try:
+        fd = os.pidfd_open(pid)
+    except OSError:
+        return None
+    _SESSION_PIDFDS[session_name] = fd
+    return fd
+
+
+def close_session_pidfd(session_name):
+    fd = _SESSION_PIDFDS.pop(session_name, None)
+    if fd is not None:
+        os.close(fd)
+
+
 def check_session_status(client, state):
-    """Check if any running sessions have completed and post summaries."""
+    """Check if any running sessions have completed and post summaries.
+
+    Returns the names of sessions that completed (and were removed from state).
+    """
     sessions = state.get("sessions", {})
+    if not sessions:
+        return []
     completed = []
+    ended = set()
+
+    # A pidfd becomes readable when its process exits; one poll() covers them all
+    poller = select.poll()
+    fd_names = {}
+    needs_tmux = []
+    for session_name in sessions:
+        fd = _SESSION_PIDFDS.get(session_name)
+        if fd is None:
+            needs_tmux.append(session_name)
+        else:
+            poller.register(fd, select.POLLIN)
+            fd_names[fd] = session_name
+    if fd_names:
+        for fd, _ in poller.poll(0):
+            ended.add(fd_names[fd])
+
+    # One tmux call for sessions without a pidfd (e.g. reloaded from state after
+    # a restart) instead of has-session per session
+    if needs_tmux:
+        live = list_tmux_sessions()
+        for session_name in needs_tmux:
+            if session_name not in live:
+                ended.add(session_name)
+            elif live[session_name] == sessions[session_name].get("pid"):
+                # tmux confirms the saved PID is still this session's pane,
+                # so it hasn't been recycled and can be watched via pidfd
+                open_session_pidfd(session_name, live[session_name])
 
     for session_name, info in sessions.items():
-        # Check if tmux session still exists
-        result = subprocess.run(
-            ["tmux", "has-session", "-t", session_name],
-            capture_output=True,
-        )
-        if result.returncode != 0:
+        if session_name in ended:
             # Session ended
             log(f"Session {session_name} has ended")
             post_completion_summary(
@@ -210,35 +344,160 @@ def check_session_status(client, state):
                 session_name,
                 info["log_file"],
             )
+            close_session_pidfd(session_name)
             completed.append(session_name)
 
     for name in completed:
         del sessions[name]
 
+    return completed
 
-# ---------- Main loop ----------
 
-def main():
-    """Main polling loop."""
-    log("Slack-to-Claude launcher starting...")
-    LOG_DIR.mkdir(exist_ok=True)
+def launch_task(client, state, msg_ts, task_text):
+    """Acknowledge a /claude command in its thread and launch a tmux session for it."""
+    log(f"New task: {task_text[:80]}...")
 
-    client = get_slack_client()
+    # Create session
+    session_name = make_session_name(task_text)
+    log_file = str(LOG_DIR / f"{session_name}.log")
 
-    # Verify connection
+    # Acknowledge on Slack
     try:
-        auth = client.auth_test()
-        log(f"Connected as {auth['user']} ({auth['user_id']})")
+        ack_resp = client.chat_postMessage(
+            channel=SLACK_CHANNEL_ID,
+            text=(
+                f":rocket: *Launching Claude Code session*\n"
+                f"*Task:* {task_text}\n"
+                f"*Session:* `{session_name}`\n"
+                f"*Terminal:* `tmux attach -t {session_name}`\n"
+                f"*Log:* `{log_file}`"
+            ),
+            thread_ts=msg_ts,
+            unfurl_links=False,
+            unfurl_media=False,
+        )
     except Exception as e:
-        log(f"Slack auth failed: {e}")
-        sys.exit(1)
+        log(f"Slack ack failed: {e}")
+
+    # Launch the session
+    pid = launch_claude_session(task_text, session_name, log_file)
+
+    if pid is not None:
+        open_session_pidfd(session_name, pid)
+        state.setdefault("sessions", {})[session_name] = {
+            "channel": SLACK_CHANNEL_ID,
+            "thread_ts": msg_ts,
+            "log_file": log_file,
+            "task": task_text,
+            "pid": pid,
+            "started": datetime.now().isoformat(),
+        }
+    else:
+        try:
+            client.chat_postMessage(
+                channel=SLACK_CHANNEL_ID,
+                text=f":x: Failed to launch session. Check logs.",
+                thread_ts=msg_ts,
+                unfurl_links=False,
+                unfurl_media=False,
+            )
+        except Exception:
+            pass
 
-    state = load_state()
+
+# ---------- Main loop ----------
+
+def run_socket_mode(client, state, app_token):
+    """Receive /claude commands as Socket Mode events; check sessions on a timer.
+
+    This is the app's only Socket Mode connection: escalator watchers poll, and
+    thread replies received here are passed on to them via deliver_thread_reply.
+    """
+    from slack_sdk.socket_mode import SocketModeClient
+    from slack_sdk.socket_mode.response import SocketModeResponse
+
+    lock = threading.Lock()
+
+    def on_request(sm_client, req):
+        if req.type != "events_api":
+            return
+        sm_client.send_socket_mode_response(SocketModeResponse(envelope_id=req.envelope_id))
+
+        event = (req.payload or {}).get("event", {}) or {}
+        if event.get("type") != "message":
+            return
+        if event.get("subtype") or event.get("bot_id"):
+            return
+        # Thread replies are not commands. Slack delivers each event to only one
+        # of the app's connections and this is the only one, so hand replies to
+        # escalated questions over to the escalator's answer files.
+        msg_ts = event.get("ts", "")
+        if event.get("thread_ts", msg_ts) != msg_ts:
+            try:
+                answer = escalator.deliver_thread_reply(event)
+                if answer:
+                    log(f"Delivered Slack answer for thread {event.get('thread_ts')}: {answer!r}")
+            except Exception as e:
+                log(f"Thread reply delivery error: {e}")
+            return
+        if event.get("channel") != SLACK_CHANNEL_ID:
+            return
+
+        text = event.get("text", "")
+        task_text = parse_command(text) if f"<@{BOT_USER_ID}>" in text else None
+
+        try:
+            with lock:
+                # Keep the polling checkpoint current so a later run_polling
+                # (e.g. Socket Mode fallback after a restart) won't relaunch these
+                state["last_checked"] = max(msg_ts, state.get("last_checked", "0"), key=float)
+                if task_text:
+                    launch_task(client, state, msg_ts, task_text)
+                    processed = state.setdefault("processed", [])
+                    processed.append(msg_ts)
+                    del processed[:-PROCESSED_MAX]
+                save_state(state)
+        except Exception as e:
+            log(f"Event error: {e}")
+
+    sm_client = SocketModeClient(app_token=app_token, web_client=client)
+    sm_client.socket_mode_request_listeners.append(on_request)
+    try:
+        sm_client.connect()
+    except Exception:
+        sm_client.close()
+        raise
+
+    log(f"Listening on #{SLACK_CHANNEL_ID} via Socket Mode for /claude commands...")
+    log(f"Trigger: @bot /claude <task>")
+
+    while True:
+        time.sleep(SESSION_CHECK_INTERVAL)
+        try:
+            with lock:
+                if check_session_status(client, state):
+                    save_state(state)
+        except Exception as e:
+            log(f"Session check error: {e}")
+
+
+def run_polling(client, state):
+    """Poll conversations.history for /claude commands."""
     # On fresh start, set last_checked to now to avoid processing old messages
     if "last_checked" not in state:
         state["last_checked"] = str(time.time())
         save_state(state)
 
+    # Bounded insertion order for persistence + set for O(1) membership checks
+    processed_order = collections.deque(state.get("processed", []), maxlen=PROCESSED_MAX)
+    processed_set = set(processed_order)
+
+    def mark_processed(ts):
+        if len(processed_order) == processed_order.maxlen:
+            processed_set.discard(processed_order[0])
+        processed_order.append(ts)
+        processed_set.add(ts)
+
     log(f"Polling #{SLACK_CHANNEL_ID} every {POLL_INTERVAL}s for /claude commands...")
     log(f"Trigger: @bot /claude <task>")
 
@@ -250,6 +509,7 @@ def main():
                 limit=10,
             )
 
+            dirty = False
             last_checked_f = float(state["last_checked"])
             messages = resp.get("messages", [])
             for msg in reversed(messages):  # oldest first
@@ -261,7 +521,7 @@ def main():
                     continue
 
                 # Skip already processed
-                if msg_ts in state.get("processed", []):
+                if msg_ts in processed_set:
                     continue
 
                 # Check for bot mention + /claude command
@@ -271,70 +531,28 @@ def main():
                 task_text = parse_command(text)
                 if not task_text:
                     # Not a /claude command, might be a question reply
-                    state.setdefault("processed", []).append(msg_ts)
+                    mark_processed(msg_ts)
+                    dirty = True
                     continue
 
-                log(f"New task: {task_text[:80]}...")
-
-                # Create session
-                session_name = make_session_name(task_text)
-                log_file = str(LOG_DIR / f"{session_name}.log")
-
-                # Acknowledge on Slack
-                try:
-                    ack_resp = client.chat_postMessage(
-                        channel=SLACK_CHANNEL_ID,
-                        text=(
-                            f":rocket: *Launching Claude Code session*\n"
-                            f"*Task:* {task_text}\n"
-                            f"*Session:* `{session_name}`\n"
-                            f"*Terminal:* `tmux attach -t {session_name}`\n"
-                            f"*Log:* `{log_file}`"
-                        ),
-                        thread_ts=msg_ts,
-                        unfurl_links=False,
-                        unfurl_media=False,
-                    )
-                except Exception as e:
-                    log(f"Slack ack failed: {e}")
-
-                # Launch the session
-                success = launch_claude_session(task_text, session_name, log_file)
-
-                if success:
-                    state.setdefault("sessions", {})[session_name] = {
-                        "channel": SLACK_CHANNEL_ID,
-                        "thread_ts": msg_ts,
-                        "log_file": log_file,
-                        "task": task_text,
-                        "started": datetime.now().isoformat(),
-                    }
-                else:
-                    try:
-                        client.chat_postMessage(
-                            channel=SLACK_CHANNEL_ID,
-                            text=f":x: Failed to launch session. Check logs.",
-                            thread_ts=msg_ts,
-                            unfurl_links=False,
-                            unfurl_media=False,
-                        )
-                    except Exception:
-                        pass
-
-                state.setdefault("processed", []).append(msg_ts)
+                launch_task(client, state, msg_ts, task_text)
+
+                mark_processed(msg_ts)
+                dirty = True
 
             # Update last_checked to latest message ts
-            if messages:
+            if messages and state["last_checked"] != messages[0]["ts"]:
                 state["last_checked"] = messages[0]["ts"]  # newest first from API
-
-            # Trim processed list (keep last 100)
-            if len(state.get("processed", [])) > 100:
-                state["processed"] = state["processed"][-100:]
+                dirty = True
 
             # Check for completed sessions
-            check_session_status(client, state)
+            if check_session_status(client, state):
+                dirty = True
 
-            save_state(state)
+            # Only hit the disk when something changed
+            if dirty:
+                state["processed"] = list(processed_order)
+                save_state(state)
 
         except Exception as e:
             log(f"Poll error: {e}")
@@ -342,6 +560,38 @@ def main():
         time.sleep(POLL_INTERVAL)
 
 
+def main():
+    """Connect to Slack and listen for /claude commands."""
+    log("Slack-to-Claude launcher starting...")
+    LOG_DIR.mkdir(exist_ok=True)
+
+    client = get_slack_client()
+
+    # Verify connection
+    try:
+        auth = client.auth_test()
+        log(f"Connected as {auth['user']} ({auth['user_id']})")
+    except Exception as e:
+        log(f"Slack auth failed: {e}")
+        sys.exit(1)
+
+    state = load_state()
+
+    # Socket Mode needs an app-level token; without one, fall back to polling
+    app_token = os.environ.get("SLACK_APP_TOKEN", "")
+    if app_token.startswith("xapp-"):
+        try:
+            run_socket_mode(client, state, app_token)
+            return
+        except ImportError as e:
+            log(f"Socket Mode unavailable ({e}), falling back to polling")
+        except Exception as e:
+            # Bad/revoked app token or network failure: keep serving by polling
+            log(f"Socket Mode connect failed ({e}), falling back to polling")
+
+    run_polling(client, state)
+
+
 if __name__ == "__main__":
     if len(sys.argv) > 1 and sys.argv[1] == "test-parse":
         # Quick parse test